@@ -1,17 +1,17 @@
 from dataclasses import dataclass
 import importlib
-import pkgutil
 import sys
+from typing import TYPE_CHECKING
 
 from loguru import logger
+import numpy as np
 
-import busio
-import board
-import digitalio
-from adafruit_rgb_display.rgb import DisplaySPI
+if TYPE_CHECKING:
+    from adafruit_rgb_display.rgb import DisplaySPI
+    from PIL import Image
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class DisplayConfig:
     display_type: str
     display_cs: str
@@ -25,49 +25,64 @@ class DisplayConfig:
     display_y_offset: int
 
 
+# config display type -> (module, class) of the adafruit_rgb_display driver
+DISPLAY_CLASSES: dict[str, tuple[str, str]] = {
+    "gc9a01a.GC9A01A": ("adafruit_rgb_display.gc9a01a", "GC9A01A"),
+    "hx8353.HX8353": ("adafruit_rgb_display.hx8353", "HX8353"),
+    "hx8357.HX8357": ("adafruit_rgb_display.hx8357", "HX8357"),
+    "ili9341.ILI9341": ("adafruit_rgb_display.ili9341", "ILI9341"),
+    "s6d02a1.S6D02A1": ("adafruit_rgb_display.s6d02a1", "S6D02A1"),
+    "ssd1331.SSD1331": ("adafruit_rgb_display.ssd1331", "SSD1331"),
+    "ssd1351.SSD1351": ("adafruit_rgb_display.ssd1351", "SSD1351"),
+    "st7735.ST7735": ("adafruit_rgb_display.st7735", "ST7735"),
+    "st7735.ST7735R": ("adafruit_rgb_display.st7735", "ST7735R"),
+    "st7735.ST7735S": ("adafruit_rgb_display.st7735", "ST7735S"),
+    "st7789.ST7789": ("adafruit_rgb_display.st7789", "ST7789"),
+}
+
+
 class Display:
     @staticmethod
-    def create(cfg: DisplayConfig) -> DisplaySPI:
+    def create(cfg: DisplayConfig) -> "DisplaySPI":
+        # the board libraries probe the hardware on import, defer them until
+        # a display is actually created
+        import board
+        import busio
+        import digitalio
+
         spi = busio.SPI(clock=board.SCK, MOSI=board.MOSI, MISO=board.MISO)
         logger.debug("SPI initialized")
-        # Import display library
-        try:
-            display_module = importlib.import_module(
-                f"adafruit_rgb_display.{cfg.display_type.split('.')[0]}"
-            )
-        except ImportError as e:
-            logger.error(
-                f"Failed to import display module: {e}. Please ensure the adafruit_rgb_display library is installed."
-            )
+        if cfg.display_type not in DISPLAY_CLASSES:
             logger.error(
-                f"Possible modules: {(pkg.name for pkg in pkgutil.iter_modules(importlib.import_module('adafruit_rgb_display').__path__) if pkg.name != 'rgb')}"
+                f"Display type {cfg.display_type} is not supported. Please check your configuration."
             )
+            logger.error(f"Possible types: {list(DISPLAY_CLASSES)}")
             sys.exit(1)
-        if not hasattr(display_module, cfg.display_type.split(".")[1]):
-            logger.error(
-                f"Display type {cfg.display_type} not found in adafruit_rgb_display.{cfg.display_type.split('.')[0]}. Please check your configuration."
-            )
-            sys.exit(1)
-        if not hasattr(board, f"{cfg.display_cs}"):
-            logger.error(
-                f"Display CS pin {cfg.display_cs} not found on in `CircuitPython:board`. Please check your configuration."
-            )
-            sys.exit(1)
-        if not hasattr(board, f"{cfg.display_dc}"):
-            logger.error(
-                f"Display DC pin {cfg.display_dc} not found on in `CircuitPython:board`. Please check your configuration."
-            )
-            sys.exit(1)
-        if not hasattr(board, f"{cfg.display_reset}"):
+        module_name, class_name = DISPLAY_CLASSES[cfg.display_type]
+        try:
+            display_class = getattr(importlib.import_module(module_name), class_name)
+        except ImportError as e:
             logger.error(
-                f"Display reset pin {cfg.display_reset} not found on in `CircuitPython:board`. Please check your configuration."
+                f"Failed to import display module: {e}. Please ensure the adafruit_rgb_display library is installed."
             )
             sys.exit(1)
-        display: DisplaySPI = getattr(display_module, cfg.display_type.split(".")[1])(
+        # board resolves pin names through a module __getattr__, look each
+        # name up once
+        pins = {}
+        for role in ("cs", "dc", "reset"):
+            name = getattr(cfg, f"display_{role}")
+            pin = pins[role] = getattr(board, name, None)
+            if pin is None:
+                logger.error(
+                    f"Display {role} pin {name} not found on in `CircuitPython:board`. Please check your configuration."
+                )
+                sys.exit(1)
+        dios = {role: digitalio.DigitalInOut(pin) for role, pin in pins.items()}
+        display: "DisplaySPI" = display_class(
             spi,
-            cs=digitalio.DigitalInOut(getattr(board, f"{cfg.display_cs}")),
-            dc=digitalio.DigitalInOut(getattr(board, f"{cfg.display_dc}")),
-            rst=digitalio.DigitalInOut(getattr(board, f"{cfg.display_reset}")),
+            cs=dios["cs"],
+            dc=dios["dc"],
+            rst=dios["reset"],
             width=cfg.display_width,
             height=cfg.display_height,
             rotation=cfg.display_rotation,
@@ -77,3 +92,48 @@ class Display:
         )
         logger.debug("Display initialized")
         return display
+
+
+def show_image(display: "DisplaySPI", img: "Image.Image", x: int = 0, y: int = 0) -> None:
+    """
+    Draw an RGB image at panel coordinates, like ``display.image``.
+
+    ``display.image`` packs RGB565 through a Python list of every byte; this
+    packs it with numpy and writes the block straight to the panel.
+    """
+    if display.rotation:
+        img = img.rotate(display.rotation, expand=True)
+    rgb = np.asarray(img)
+    # widen one channel at a time and pack in place, rather than widening
+    # the whole frame to 16 bits per channel first
+    color = np.empty(rgb.shape[:2], dtype=">u2")
+    np.left_shift(rgb[:, :, 0] & 0xF8, 8, out=color, dtype=np.uint16)
+    color |= np.left_shift(rgb[:, :, 1] & 0xFC, 3, dtype=np.uint16)
+    color |= rgb[:, :, 2] >> 3
+    display._block(x, y, x + img.width - 1, y + img.height - 1, color.tobytes())
+
+
+def image_region(
+    display: "DisplaySPI",
+    region: "Image.Image",
+    box: tuple[int, int, int, int],
+    size: tuple[int, int],
+) -> None:
+    """
+    Push ``region``, cropped at ``box`` from a full screen image of ``size``.
+
+    ``display.image`` rotates whatever it is given by the panel rotation and
+    places it at panel coordinates, so the box origin is rotated the same way.
+    """
+    left, top, right, bottom = box
+    width, height = size
+    match display.rotation:
+        case 90:
+            x, y = top, width - right
+        case 180:
+            x, y = width - right, height - bottom
+        case 270:
+            x, y = height - bottom, left
+        case _:
+            x, y = left, top
+    show_image(display, region, x, y)
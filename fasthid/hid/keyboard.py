@@ -4,15 +4,14 @@ import select
 
 
 def send_keystroke(keyboard_path, control_keys, hid_keycode, release=True):
-    buf = [0] * 8
-    buf[0] = control_keys
-    buf[2] = hid_keycode
-    hid_write.write_to_hid_interface_immediately(keyboard_path, buf)
+    buf = bytes((control_keys, 0, hid_keycode, 0, 0, 0, 0, 0))
 
     # If it's a normal keycode (i.e. not a standalone modifier key), add a
     # message indicating that the key should be released after it is sent.
     if release:
-        release_keys(keyboard_path)
+        hid_write.write_press_release(keyboard_path, buf)
+    else:
+        hid_write.write_to_hid_interface_immediately(keyboard_path, buf)
 
 
 def read_last_report(keyboard: "BufferedReader", size: int):
@@ -28,4 +27,6 @@ def read_last_report(keyboard: "BufferedReader", size: int):
 
 
 def release_keys(keyboard_path):
-    hid_write.write_to_hid_interface_immediately(keyboard_path, [0] * 8)
+    hid_write.write_to_hid_interface_immediately(
+        keyboard_path, hid_write.RELEASE_REPORT
+    )
@@ -1,5 +1,93 @@
+import logging
 import os
-from loguru import logger
+import select
+
+logger = logging.getLogger(__name__)
+
+
+_suspended_paths: dict[str, str] = {}
+
+
+def _suspended_path(udc_addr: str) -> str:
+    path = _suspended_paths.get(udc_addr)
+    if path is None:
+        path = _suspended_paths[udc_addr] = os.path.join(
+            "/sys/class/udc/", udc_addr, "gadget/suspended"
+        )
+    return path
+
+
+class SuspendWatcher:
+    """
+    Hold the UDC gadget ``suspended`` attribute open for repeated reads.
+
+    sysfs regenerates an attribute's contents on every read from offset 0,
+    so the state can be refreshed with a single ``pread`` on the held
+    descriptor instead of an open/read/close for each check.
+    """
+
+    def __init__(self, udc_addr: str) -> None:
+        self.path = _suspended_path(udc_addr)
+        self.fd = os.open(self.path, os.O_RDONLY | os.O_CLOEXEC)
+
+    @property
+    def suspended(self) -> bool:
+        return os.pread(self.fd, 2, 0)[:1] == b"1"
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class UdcStateWatcher:
+    """
+    Wait for changes of the UDC ``state`` attribute.
+
+    The UDC core calls ``sysfs_notify`` on ``state`` whenever the gadget
+    changes state, which wakes a ``poll`` for ``POLLPRI`` on a held
+    descriptor. The attribute has to be read after every wake to re-arm it.
+    """
+
+    def __init__(self, udc_addr: str) -> None:
+        self.path = os.path.join("/sys/class/udc/", udc_addr, "state")
+        self.fd = os.open(self.path, os.O_RDONLY | os.O_CLOEXEC)
+        self.poller = select.poll()
+        self.poller.register(self.fd, select.POLLPRI | select.POLLERR)
+        self.read()
+
+    def read(self) -> str:
+        return os.pread(self.fd, 64, 0).decode().strip()
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Block until the UDC state changes or the timeout expires.
+
+        :param timeout: Longest time to wait, in seconds.
+        :return: True if the state changed, False on timeout.
+        """
+        changed = bool(self.poller.poll(timeout * 1000))
+        self.read()
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+_watchers: dict[str, SuspendWatcher] = {}
+
+
+def _read_suspended_once(udc_addr: str) -> bool:
+    try:
+        fd = os.open(_suspended_path(udc_addr), os.O_RDONLY | os.O_CLOEXEC)
+        try:
+            # the attribute is always "0\n" or "1\n"
+            return os.read(fd, 2)[:1] == b"1"
+        finally:
+            os.close(fd)
+    except FileNotFoundError:
+        return True
+    except PermissionError as e:
+        logger.error("Error reading UDC gadget suspended status: %s", e)
+        return False
 
 
 def read_udc_gadget_suspended(udc_addr: str) -> bool:
@@ -9,14 +97,16 @@ def read_udc_gadget_suspended(udc_addr: str) -> bool:
     :param udc_addr: The address of the UDC.
     :return: True if the UDC is suspended, False otherwise.
     """
+    watcher = _watchers.get(udc_addr)
+    if watcher is None:
+        try:
+            watcher = _watchers[udc_addr] = SuspendWatcher(udc_addr)
+        except OSError:
+            return _read_suspended_once(udc_addr)
     try:
-        with open(
-            os.path.join("/sys/class/udc/", udc_addr, "gadget/suspended"), "r"
-        ) as f:
-            status = f.read().strip()
-        return status == "1"
-    except FileNotFoundError:
-        return True
-    except Exception as e:
-        logger.error(f"Error reading UDC gadget suspended status: {e}")
-        return False
+        return watcher.suspended
+    except OSError:
+        # the gadget was unbound underneath us, reopen on the next call
+        del _watchers[udc_addr]
+        watcher.close()
+        return _read_suspended_once(udc_addr)
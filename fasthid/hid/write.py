@@ -1,4 +1,6 @@
-from loguru import logger
+import atexit
+import io
+import os
 
 
 class Error(Exception):
@@ -9,12 +11,89 @@ class WriteError(Error):
     pass
 
 
+# all keys up; shared by every release so it is never rebuilt per keystroke
+RELEASE_REPORT = bytes(8)
+
+# Linux UIO_MAXIOV, the most iovecs a single writev accepts
+_IOV_MAX = 1024
+
+_hid_fd_cache: dict[str, int] = {}
+
+
+def _get_fd(path: str) -> int:
+    fd = _hid_fd_cache.get(path)
+    if fd is None:
+        # blocking on purpose: a non-blocking gadget rejects every report
+        # queued while the host has not yet polled the previous one
+        fd = _hid_fd_cache[path] = os.open(path, os.O_WRONLY | os.O_CLOEXEC)
+    return fd
+
+
+@atexit.register
+def _close_fds():
+    while _hid_fd_cache:
+        _, fd = _hid_fd_cache.popitem()
+        os.close(fd)
+
+
 def write_to_hid_interface_immediately(hid_dev, buffer):
+    """
+    Write one HID report to the device and return once the gadget took it.
+
+    Reports for a device must come from a single thread; the gadget keeps
+    no ordering between concurrent writers.
+    """
+    # any buffer-protocol object is written as-is, without an interim copy
+    report = memoryview(buffer).cast("B")
     try:
-        hid_dev.seek(0)
-        hid_dev.write(bytearray(buffer))
-        hid_dev.flush()
-    except BlockingIOError:
-        logger.error(
+        if isinstance(hid_dev, (str, int)):
+            fd = _get_fd(hid_dev) if isinstance(hid_dev, str) else hid_dev
+            # positional write to offset 0: seek + write in a single syscall
+            written = os.pwrite(fd, report, 0)
+        else:
+            hid_dev.seek(0)
+            written = hid_dev.write(report)
+            # raw (buffering=0) files reach the device on write already
+            if isinstance(hid_dev, io.BufferedIOBase):
+                hid_dev.flush()
+    except BlockingIOError as e:
+        raise WriteError(
             f"Failed to write to HID interface: {hid_dev}. Is USB cable connected and Gadget module installed? check https://git.io/J1T7Q"
+        ) from e
+    # the report is only accepted by the gadget as a whole
+    if written is not None and written != len(report):
+        raise WriteError(
+            f"Short write to HID interface: {hid_dev} ({written}/{len(report)} bytes)"
         )
+
+
+def write_reports_batch(hid_dev, buffers):
+    """
+    Write a sequence of HID reports in order with a single writev per chunk.
+
+    The gadget consumes a writev one iovec at a time, so each buffer still
+    reaches the host as its own report.
+    """
+    if not isinstance(hid_dev, (str, int)):
+        for buffer in buffers:
+            write_to_hid_interface_immediately(hid_dev, buffer)
+        return
+    fd = _get_fd(hid_dev) if isinstance(hid_dev, str) else hid_dev
+    for start in range(0, len(buffers), _IOV_MAX):
+        chunk = buffers[start : start + _IOV_MAX]
+        try:
+            written = os.writev(fd, chunk)
+        except BlockingIOError as e:
+            raise WriteError(
+                f"Failed to write to HID interface: {hid_dev}. Is USB cable connected and Gadget module installed? check https://git.io/J1T7Q"
+            ) from e
+        expected = sum(memoryview(buffer).nbytes for buffer in chunk)
+        if written != expected:
+            raise WriteError(
+                f"Short write to HID interface: {hid_dev} ({written}/{expected} bytes)"
+            )
+
+
+def write_press_release(hid_dev, press_buf, release_buf=RELEASE_REPORT):
+    """Write a key press report and its release in a single writev."""
+    write_reports_batch(hid_dev, (press_buf, release_buf))
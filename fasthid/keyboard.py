@@ -1,6 +1,12 @@
 from typing import List
 
-from .hid.keyboard import send_keystroke, release_keys, read_last_report
+from .hid.keyboard import release_keys, read_last_report
+from .hid.write import (
+    RELEASE_REPORT,
+    write_press_release,
+    write_reports_batch,
+    write_to_hid_interface_immediately,
+)
 from .hid.keycodes import KeyCodes
 from . import defaults
 from time import sleep
@@ -22,9 +28,14 @@ class LEDState(TypedDict):
 class Keyboard:
     def __init__(self, dev=defaults.KEYBOARD_PATH) -> None:
         if not hasattr(dev, "write"):  # check if file like object
-            self.dev = open(dev, "ab+")
+            self.dev = open(dev, "ab+", buffering=0)
+            # reports are written through the descriptor cached for the path
+            self.out = dev
         else:
             self.dev = dev
+            self.out = dev
+        # scratch report for press(), filled in place for every key
+        self._report = bytearray(8)
         self.set_layout()
 
     def list_layout(self):
@@ -56,21 +67,44 @@ class Keyboard:
         self.layout = json.loads(
             pkgutil.get_data(__name__, f"keymaps/{language}.json").decode()
         )
+        # resolve every mapping to its press report once, so typing is a
+        # plain dict lookup per character
+        self._reports = {}
+        for name, key_maps in self.layout["Mapping"].items():
+            try:
+                self._reports[name] = self._build_report(key_maps[0])
+            except AttributeError:
+                # some keymaps carry unknown key names such as
+                # "Modifiers": [""], those only fail once typed
+                pass
+
+    def _report_for(self, c) -> bytes:
+        report = self._reports.get(c)
+        if report is None:
+            # raises for unmapped or unresolvable characters
+            report = self._build_report(self.layout["Mapping"][c][0])
+        return report
+
+    @staticmethod
+    def _build_report(key_map) -> bytes:
+        mods = reduce(operator.or_, (KeyCodes[i] for i in key_map["Modifiers"]), 0)
+        keys = key_map["Keys"]
+        key_code = KeyCodes[keys[0]] if keys else 0
+        return bytes((mods, 0, key_code, 0, 0, 0, 0, 0))
 
     def type(self, text, delay: float = 0):
+        report_for = self._report_for
+        if not delay:
+            # nothing to wait for between keys: hand the whole string to the
+            # gadget as one ordered batch of press/release reports
+            batch = []
+            for c in text:
+                batch.append(report_for(c))
+                batch.append(RELEASE_REPORT)
+            write_reports_batch(self.out, batch)
+            return
         for c in text:
-            key_map = self.layout["Mapping"][c]
-            key_map = key_map[0]
-            mods = key_map["Modifiers"]
-            keys = key_map["Keys"]
-            mods = [KeyCodes[i] for i in mods]
-            keys = [KeyCodes[i] for i in keys]
-
-            if len(mods) == 1:
-                mods = mods[0]
-            else:
-                mods = reduce(operator.or_, mods, 0)
-            send_keystroke(self.dev, mods, keys[0])
+            write_press_release(self.out, report_for(c))
             sleep(delay)
 
     def press(self, mods: List[int], key_code: int = 0, release=True):
@@ -78,10 +112,16 @@ class Keyboard:
             mods = mods[0]
         else:
             mods = reduce(operator.or_, mods, 0)
-        send_keystroke(self.dev, mods, key_code, release=release)
+        report = self._report
+        report[0] = mods
+        report[2] = key_code
+        if release:
+            write_press_release(self.out, report)
+        else:
+            write_to_hid_interface_immediately(self.out, report)
 
     def release(self):
-        release_keys(self.dev)
+        release_keys(self.out)
 
     def __enter__(self):
         return self
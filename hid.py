@@ -4,7 +4,8 @@ import time
 from typing import Callable
 
 from loguru import logger
-from fasthid.hid.read import read_udc_gadget_suspended
+from fasthid.hid.read import UdcStateWatcher, read_udc_gadget_suspended
+from fasthid.hid.write import WriteError
 from fasthid.keyboard import Keyboard
 
 
@@ -16,7 +17,8 @@ class HIDInterface:
         self.udc_connected = False
         self.hid_delay = 0.0
         self.ending = "\n"
-        self.barcode_queue = queue.Queue()
+        # barcodes in arrival order, None stops the sender
+        self.barcode_queue = queue.SimpleQueue()
 
         self.hid_thread = threading.Thread(
             target=self.hid_sender_thread, args=(self.barcode_queue,)
@@ -28,22 +30,43 @@ class HIDInterface:
         )
         self.hid_conn_check_thread.start()
         
-    def hid_sender_thread(self, in_queue: queue.Queue):
+    def hid_sender_thread(self, in_queue: queue.SimpleQueue):
         kb = Keyboard(self.hid_path)
         while True:
+            code = in_queue.get()
+            if code is None:
+                break
             try:
-                code = in_queue.get(timeout=0.1)
                 connection = self.check_enabled()
                 if connection:
                     logger.debug(f"Sending barcode over HID: {code}")
                     kb.type(code+self.ending, self.hid_delay)
-            except queue.Empty:
-                continue
+            except WriteError as e:
+                logger.error(e)
 
     def hid_connection_check(self, udc_path: str):
+        try:
+            watcher = UdcStateWatcher(udc_path)
+        except OSError as e:
+            logger.warning(f"Cannot watch UDC state, polling instead: {e}")
+            watcher = None
         while True:
-            self.udc_connected = not read_udc_gadget_suspended(udc_path)
-            time.sleep(0.5)
+            try:
+                self.udc_connected = not read_udc_gadget_suspended(udc_path)
+            except OSError as e:
+                logger.error(f"Failed to read UDC state: {e}")
+                self.udc_connected = False
+            # wake early on a state change, the timeout still catches
+            # controllers that do not report suspend through the state
+            if watcher is None:
+                time.sleep(0.5)
+                continue
+            try:
+                watcher.wait(0.5)
+            except OSError as e:
+                logger.warning(f"Lost UDC state watch, polling instead: {e}")
+                watcher.close()
+                watcher = None
 
     def apply_delay(self, delay: float):
         self.hid_delay = delay
@@ -58,4 +81,8 @@ class HIDInterface:
                 self.ending = ""
 
     def send(self, data: str):
-        self.barcode_queue.put_nowait(data)
\ No newline at end of file
+        self.barcode_queue.put_nowait(data)
+
+    def close(self):
+        """Stop the sender thread once the queued barcodes are typed."""
+        self.barcode_queue.put_nowait(None)
\ No newline at end of file
@@ -1,4 +1,6 @@
 import argparse
+import os
+import queue
 import subprocess
 import sys
 import threading
@@ -7,15 +9,12 @@ import json
 
 from loguru import logger
 import elevate
+import numpy as np
 import yaml
 
-from PIL import Image, ImageDraw
+from PIL import Image, ImageChops, ImageDraw
 
-import board
-import neopixel
 from gpiozero import RotaryEncoder, Button
-from picamera2 import Picamera2
-from pyzbar.pyzbar import decode
 
 from hid import HIDInterface
 from vnc.vncserver import VNCConfig
@@ -29,12 +28,20 @@ from settings import (
     StringOptionSetting,
 )
 from tone import TonePlayer
-from display import Display, DisplayConfig
+from display import Display, DisplayConfig, image_region, show_image
 from ui import UserInterface, FontConfig, DisplayInfo, UiParams, ConnectionData
 from ui_interface import UserInterfaceInputController
 from remoteview import vnc_server_thread
 from util import is_root
 
+# mean luma step between sampled neighbours below which a crop is treated as
+# blank or out of focus and not decoded
+MIN_EDGE_ENERGY = 2.0
+# mean luma change between sampled crops below which the scene is treated
+# as unchanged, and how many such crops may skip zbar after a miss
+MIN_MOTION = 2.0
+MAX_STATIC_SKIPS = 10
+
 
 class ScannerGui:
     def __init__(self):
@@ -121,6 +128,15 @@ class ScannerGui:
         self.trigger_button_pull_up = self.trigger_config.get("pull_up", True)
 
         self.camera_res = self.camera_config.get("resolution", (1920, 1080))
+        # keep every n-th pixel of the target crop for zbar, a high main
+        # resolution resolves bars far finer than zbar needs
+        decode_step = self.camera_config.get("decode_step", 1)
+        # used as a slice step, anything below 1 would stop the capture
+        self.decode_step = max(1, int(decode_step))
+        if self.decode_step != decode_step:
+            logger.warning(
+                f"camera decode_step {decode_step!r} is not a positive integer, using {self.decode_step}"
+            )
 
         self.toolbar_height = self.gui_config.get("toolbar_height", 30)
         self.visible_settings = self.gui_config.get("menu_items", 3)
@@ -190,30 +206,71 @@ class ScannerGui:
 
         logger.debug("Encoder and button initialized")
 
-        if not hasattr(board, f"D{self.led_pin}"):
+        # board, neopixel, picamera2 and pyzbar load native libraries and
+        # probe the hardware on import, so they are only imported once the
+        # arguments and config are known to be good
+        import board
+        import neopixel
+
+        led_pin = getattr(board, f"D{self.led_pin}", None)
+        if led_pin is None:
             logger.error(
                 f"LED pin D{self.led_pin} not found on in `CircuitPython:board`. Please check your configuration."
             )
             sys.exit(1)
         self.led = neopixel.NeoPixel(
-            getattr(board, f"D{self.led_pin}"),
+            led_pin,
             self.led_count,
             brightness=0.2,
             auto_write=False,
         )
         self.led_rgb = [0, 0, 0]
+        self.led_brightness = 0.2
+        # LED settings only mark the strip dirty, one thread pushes the
+        # latest state at most 30 times a second
+        self.led_dirty = threading.Event()
+        self.led_thread = threading.Thread(target=self.led_update_thread, daemon=True)
+        self.led_thread.start()
         logger.debug("Led initialized")
 
+        from picamera2 import Picamera2
+        from pyzbar.pyzbar import decode
+
+        # loaded here so a missing libzbar stops startup instead of
+        # silently killing the decode thread
+        self.zbar_decode = decode
         self.picam2 = Picamera2()
-        config = self.picam2.create_preview_configuration(
-            main={"size": self.camera_res, "format": "BGR888"}
+        # the ISP scales the viewfinder into the lores stream, the full
+        # resolution main stream is only read while scanning and only its
+        # luma plane is handed to zbar
+        config = self.picam2.create_video_configuration(
+            main={"size": self.camera_res, "format": "YUV420"},
+            lores={
+                "size": (self.display.width, self.display.height - self.toolbar_height),
+                "format": "YUV420",
+            },
+            # only the newest frame matters, a deeper queue is just latency
+            buffer_count=2,
         )
         self.picam2.configure(config)
+        self.main_size = tuple(self.picam2.stream_configuration("main")["size"])
+        self.vf_size = tuple(self.picam2.stream_configuration("lores")["size"])
         self.picam2.start()
         logger.debug("Camera initialized")
 
-        # Image buffer and lock
-        self.viewfinder = Image.new("RGB", (self.display.width, self.display.height))
+        # Image buffers, the capture thread fills one while another is
+        # published and the display thread may still be drawing a third
+        self.vf_buffers = [
+            Image.new("RGB", (self.display.width, self.display.height))
+            for _ in range(3)
+        ]
+        # guards handing buffers between the capture and display threads
+        self.vf_lock = threading.Lock()
+        # buffer the display thread took, not refilled until it takes another
+        self.vf_drawing: Image.Image | None = None
+        # bumped whenever the viewfinder content changes
+        self.vf_frame = 0
+        self.viewfinder = self.vf_buffers[0]
         self.state = UIState.IDLE
 
         # Init target, will be replaced when settings are loaded
@@ -221,16 +278,15 @@ class ScannerGui:
         self.target_height = 50
 
         self.barcodes = []
+        self.crop_boxes = None
 
         # HID setup
         def check_connection():
-            option = next((s for s in self.settings if s.id == "connection"))
-            return option and option.value == "USB"
-        self.hid = HIDInterface(self.hid_udc, self.hid_path, lambda: check_connection)
+            return self.settings_by_id["connection"].value == "USB"
+
+        self.hid = HIDInterface(self.hid_udc, self.hid_path, check_connection)
 
         # Settings setup
-        self.hid_thread: threading.Thread | None = None
-        self.settings_lock = threading.Lock()
         self.settings = [
             StringOptionSetting(
                 id="connection",
@@ -449,7 +505,20 @@ class ScannerGui:
                 value=None,
             ),
         ]
+        self.settings_by_id = {s.id: s for s in self.settings}
+        self.all_settings_by_id = {
+            s.id: s for s in self.flatten_settings(self.settings)
+        }
         self.load_settings()
+        # what settings.json holds, as loaded or last written
+        self.settings_saved: bytes = self.settings_data()
+        self.settings_lock = threading.Lock()
+        self.settings_dirty = threading.Event()
+        self.settings_stop = threading.Event()
+        self.settings_thread = threading.Thread(
+            target=self.settings_writer_thread, daemon=True
+        )
+        self.settings_thread.start()
         for setting in self.settings:
             if not isinstance(setting, ButtonMenuSetting):
                 setting.apply()
@@ -483,22 +552,40 @@ class ScannerGui:
         # Start threads
         self.running = True
         self.shutdown_flag = False
+        self.shutdown_event = threading.Event()
 
         # before display thread
         if self.vnc_enable:
-            self.vnc_image = Image.new("RGB", (self.display.width, self.display.height))
+            # the display thread fills one buffer while VNC reads the other
+            self.vnc_buffers = [
+                Image.new("RGB", (self.display.width, self.display.height))
+                for _ in range(2)
+            ]
+            self.vnc_index = 0
+            self.vnc_image = self.vnc_buffers[self.vnc_index]
+            # set by the VNC server when it fetches a frame, the display
+            # thread only snapshots a frame for VNC after such a request
+            self.vnc_request = threading.Event()
             self.vnc_thread = threading.Thread(
                 target=vnc_server_thread,
                 args=(
                     VNCConfig(self.vnc_password, self.vnc_title),
                     self.vnc_bind,
                     self.vnc_port,
-                    lambda: self.vnc_image,
+                    self.vnc_frame,
                 ),
                 daemon=True,
             )
             self.vnc_thread.start()
 
+        # zbar runs on its own core, one crop in flight at a time
+        self.scan_queue: queue.Queue = queue.Queue(maxsize=1)
+        self.result_queue: queue.Queue = queue.Queue(maxsize=1)
+        self.decode_thread = threading.Thread(
+            target=self.barcode_decode_thread, daemon=True
+        )
+        self.decode_thread.start()
+
         self.image_thread = threading.Thread(target=self.image_update_thread)
         self.display_thread = threading.Thread(target=self.display_update_thread)
         self.image_thread.start()
@@ -507,17 +594,11 @@ class ScannerGui:
         logger.info("Threads started")
 
     def send_barcode(self, barcode: str):
-        option = next((s for s in self.settings if s.id == "connection"))
-        if not option:
-            return
-        if option.value == "USB":
+        if self.settings_by_id["connection"].value == "USB":
             self.hid.send(barcode)
 
     def apply_connection(self, value: str):
         logger.info(f"Connection set to {value}")
-        if value == "USB" and self.hid_thread and not self.hid_thread.is_alive():
-            self.hid_thread.start()
-            logger.debug("Restarted HID sender process")
 
     def apply_target_width(self, value: int):
         """Example callback for target width."""
@@ -531,18 +612,30 @@ class ScannerGui:
 
     def apply_led_bright(self, value: float):
         logger.info(f"Set led to {value}")
-        self.led.brightness = value
-        self.led.show()
+        self.led_brightness = value
+        self.led_dirty.set()
 
     def apply_led(self, index: int):
         def updater(value: int):
             logger.info(f"Set LED channel {index} to {value}")
             self.led_rgb[index] = value
-            self.led.fill(self.led_rgb)
-            self.led.write()
+            self.led_dirty.set()
 
         return updater
 
+    def led_update_thread(self):
+        pushed = None
+        while True:
+            self.led_dirty.wait()
+            self.led_dirty.clear()
+            state = (tuple(self.led_rgb), self.led_brightness)
+            if state != pushed:
+                pushed = state
+                self.led.brightness = self.led_brightness
+                self.led.fill(state[0])
+                self.led.show()
+            time.sleep(1 / 30)
+
     def flatten_settings(self, settings):
         flat = []
         for s in settings:
@@ -558,176 +651,351 @@ class ScannerGui:
             with open("settings.json", "r") as f:
                 data = json.load(f)
 
-            all_settings = self.flatten_settings(self.settings)
             for saved in data:
-                for setting in all_settings:
-                    if saved["id"] == setting.id:
-                        setting.value = saved["value"]
-                        logger.debug(f"Loaded setting {setting.id}: {setting.value}")
-                        break
+                setting = self.all_settings_by_id.get(saved["id"])
+                if setting is not None:
+                    setting.value = saved["value"]
+                    logger.debug(f"Loaded setting {setting.id}: {setting.value}")
         except FileNotFoundError:
             logger.debug("No settings file found, using defaults")
         except Exception as e:
             logger.error(f"Error loading settings: {e}")
 
     def save_settings(self):
+        """Schedule a save of the settings on the writer thread."""
+        self.settings_dirty.set()
+
+    def settings_writer_thread(self):
+        while True:
+            self.settings_dirty.wait()
+            # let a burst of encoder ticks settle into a single write, an
+            # exit cuts the wait short
+            self.settings_stop.wait(0.25)
+            self.settings_dirty.clear()
+            self.write_settings()
+            # a save requested during the write still gets flushed
+            if self.settings_stop.is_set() and not self.settings_dirty.is_set():
+                return
+
+    def settings_data(self) -> bytes:
+        return json.dumps(
+            [s.to_dict() for s in self.all_settings_by_id.values()],
+            separators=(",", ":"),
+        ).encode()
+
+    def write_settings(self):
         """Save settings to JSON file."""
         try:
-            with open("settings.json", "w") as f:
-                json.dump(
-                    [s.to_dict() for s in self.flatten_settings(self.settings)],
-                    f,
-                    indent=2,
-                )
+            # one writer at a time, they would share the tmp file
+            with self.settings_lock:
+                data = self.settings_data()
+                # a save can end up where it started, e.g. a value pinned at
+                # its limit, skip the write and fsync to flash then
+                if data == self.settings_saved:
+                    return
+                # write a sibling file and rename it over, a crash mid-write
+                # leaves the previous settings intact
+                with open("settings.json.tmp", "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace("settings.json.tmp", "settings.json")
+                self.settings_saved = data
             logger.debug("Settings saved")
         except Exception as e:
             logger.exception(e)
 
+    @staticmethod
+    def upsample_chroma(plane):
+        """Double a chroma plane in both axes by repeating samples."""
+        return plane.repeat(2, axis=0).repeat(2, axis=1)
+
+    def lores_to_image(self, yuv) -> Image.Image:
+        """Convert a planar YUV420 lores array to an RGB image."""
+        w, h = self.vf_size
+        stride = yuv.shape[1]
+        # the quarter size chroma planes follow luma back to back
+        flat = yuv.ravel()
+        chroma = (h // 2) * (stride // 2)
+        u = flat[h * stride : h * stride + chroma].reshape(h // 2, stride // 2)
+        v = flat[h * stride + chroma : h * stride + 2 * chroma].reshape(
+            h // 2, stride // 2
+        )
+        return Image.merge(
+            "YCbCr",
+            (
+                # luma is wrapped in place, skipping its padded row stride
+                Image.frombuffer("L", (w, h), yuv, "raw", "L", stride, 1),
+                Image.fromarray(self.upsample_chroma(u[:, : w // 2])),
+                Image.fromarray(self.upsample_chroma(v[:, : w // 2])),
+            ),
+        ).convert("RGB")
+
     def image_update_thread(self):
-        while self.running:
-            pixels = self.picam2.capture_array()
-            image = Image.fromarray(pixels)
+        from picamera2 import MappedArray
 
-            # Resize camera image to fit the bottom of the display, leaving 10px at the top for the toolbar
-            vf_height = self.display.height - self.toolbar_height
-            vf_image = image.resize(
-                (self.display.width, vf_height), Image.Resampling.NEAREST
-            )
-            # Create a new blank image for the full display
-            full_img = Image.new("RGB", (self.display.width, self.display.height))
-            # Paste the viewfinder at the bottom (y=toolbar height)
+        while self.running:
+            state = self.state
+            # read the request buffers in place, only what outlives the
+            # request is copied out before it goes back to libcamera
+            request = self.picam2.capture_request()
+            try:
+                with MappedArray(request, "lores") as lores:
+                    vf_image = self.lores_to_image(lores.array)
+                if state == UIState.SCAN:
+                    with MappedArray(request, "main") as main:
+                        scan_crop, geometry = self.crop_target(main.array)
+            finally:
+                request.release()
+
+            # Reuse the buffer that is neither published nor being drawn
+            with self.vf_lock:
+                full_img = next(
+                    b
+                    for b in self.vf_buffers
+                    if b is not self.viewfinder and b is not self.vf_drawing
+                )
+            # Paste the viewfinder at the bottom (y=toolbar height), the
+            # toolbar band is painted over by the UI on every frame
             full_img.paste(vf_image, (0, self.toolbar_height))
-            self.viewfinder = full_img
 
-            if self.state == UIState.IDLE:
+            if state == UIState.IDLE:
                 self.barcodes = []
-            elif self.state == UIState.SCAN:
-                img_w, img_h = image.size
-                disp_w = self.display.width
-                vf_height = self.display.height - self.toolbar_height  # 210
-                scale_x = img_w / disp_w
-                scale_y = img_h / vf_height
-
-                y0_disp_vf = (vf_height - self.target_height) // 2
-                y0_disp = self.toolbar_height + y0_disp_vf
-                x0_disp = (disp_w - self.target_width) // 2
-                x1_disp = x0_disp + self.target_width
-
-                x0 = int(x0_disp * scale_x)
-                y0 = int(y0_disp_vf * scale_y)  # relative to vf
-                x1 = int(x1_disp * scale_x)
-                y1 = int((y0_disp_vf + self.target_height) * scale_y)
-
-                # Clamp to image bounds
-                x0 = max(0, min(img_w, x0))
-                y0 = max(0, min(img_h, y0))
-                x1 = max(0, min(img_w, x1))
-                y1 = max(0, min(img_h, y1))
-
-                scan_crop = image.crop((x0, y0, x1, y1))
-                self.barcodes = decode(scan_crop)
-
-                if self.barcodes:
-                    self.state = UIState.IDLE
-                    self.buzzer.tones([(3000, 0.1), (4000, 0.1)])
-                    logger.info(f"Found {len(self.barcodes)} barcodes")
-
-                # determine which barcode is closest to the center of the target rectangle
-                if self.barcodes:
-                    target_center_disp = (
-                        x0_disp + self.target_width // 2,
-                        y0_disp + self.target_height // 2,
-                    )
+            elif state == UIState.SCAN:
+                # hand the crop to the decoder, drop it if one is still in flight
+                try:
+                    self.scan_queue.put_nowait((scan_crop, geometry))
+                except queue.Full:
+                    pass
+
+            try:
+                barcodes, geometry = self.result_queue.get_nowait()
+            except queue.Empty:
+                pass
+            else:
+                # results for a scan that already ended are stale
+                if self.state == UIState.SCAN:
+                    # mark the barcodes before the frame is published
+                    self.handle_barcodes(barcodes, geometry, full_img)
 
-                    def rect_center(rect):
-                        return (
-                            rect.left + rect.width // 2,
-                            rect.top + rect.height // 2,
-                        )
-
-                    closest_barcode = min(
-                        self.barcodes,
-                        key=lambda b: (rect_center(b.rect)[0] - target_center_disp[0])
-                        ** 2
-                        + (rect_center(b.rect)[1] - target_center_disp[1]) ** 2,
-                    )
-                    logger.info(
-                        f"Closest barcode: {closest_barcode.data.decode('utf-8')} at {closest_barcode.rect}"
-                    )
-                    barcode_str = closest_barcode.data.decode("utf-8")
-                    self.send_barcode(barcode_str)
-
-                # Draw barcode bounds on the viewfinder image
-                for barcode in self.barcodes:
-                    bx, by, bw, bh = barcode.rect
-                    crop_w, crop_h = scan_crop.size
-
-                    # Reuse same disp_x0 and y0_disp as above
-                    scale_x_disp = self.target_width / crop_w
-                    scale_y_disp = self.target_height / crop_h
-
-                    disp_bx0 = int(x0_disp + bx * scale_x_disp)
-                    disp_by0 = int(y0_disp + by * scale_y_disp)
-                    disp_bx1 = int(disp_bx0 + bw * scale_x_disp)
-                    disp_by1 = int(disp_by0 + bh * scale_y_disp)
-
-                    draw = ImageDraw.Draw(self.viewfinder)
-                    draw.rectangle(
-                        [disp_bx0, disp_by0, disp_bx1, disp_by1], fill="lime", width=3
-                    )
+            self.viewfinder = full_img
+            self.vf_frame += 1
+
+    def crop_target(self, pixels):
+        """Copy the target rectangle out of the luma plane of a main frame."""
+        target = (self.target_width, self.target_height)
+        # the target only moves on user input, reuse the boxes until it does
+        if self.crop_boxes is None or self.crop_boxes[0] != target:
+            self.crop_boxes = (target, *self.target_boxes(*target))
+        _, (x0, y0, x1, y1), geometry = self.crop_boxes
+        # the luma plane is the first img_h rows of the frame
+        step = self.decode_step
+        return Image.fromarray(pixels[y0:y1:step, x0:x1:step].copy()), geometry
+
+    def target_boxes(self, target_width, target_height):
+        """Map the on-screen target to a main frame crop box."""
+        img_w, img_h = self.main_size
+        disp_w = self.display.width
+        vf_height = self.display.height - self.toolbar_height  # 210
+        scale_x = img_w / disp_w
+        scale_y = img_h / vf_height
+
+        y0_disp_vf = (vf_height - target_height) // 2
+        y0_disp = self.toolbar_height + y0_disp_vf
+        x0_disp = (disp_w - target_width) // 2
+        x1_disp = x0_disp + target_width
+
+        x0 = int(x0_disp * scale_x)
+        y0 = int(y0_disp_vf * scale_y)  # relative to vf
+        x1 = int(x1_disp * scale_x)
+        y1 = int((y0_disp_vf + target_height) * scale_y)
+
+        # Clamp to image bounds
+        x0 = max(0, min(img_w, x0))
+        y0 = max(0, min(img_h, y0))
+        x1 = max(0, min(img_w, x1))
+        y1 = max(0, min(img_h, y1))
+
+        return (x0, y0, x1, y1), (x0_disp, y0_disp, target_width, target_height)
+
+    def barcode_decode_thread(self):
+        # pyzbar calls zbar through ctypes, which drops the GIL for the
+        # duration of the scan, so a thread already decodes in parallel
+        decode = self.zbar_decode
+
+        # sampled luma of the last crop zbar found nothing in
+        missed = None
+        skipped = 0
+        while self.running:
+            try:
+                scan_crop, geometry = self.scan_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            luma = np.asarray(scan_crop)[::4, ::4].astype(np.int16)
+            if (
+                missed is not None
+                and missed.shape == luma.shape
+                and skipped < MAX_STATIC_SKIPS
+                and np.abs(luma - missed).mean() < MIN_MOTION
+            ):
+                # zbar just missed this same view, it would miss it again
+                skipped += 1
+                barcodes = []
+            else:
+                skipped = 0
+                barcodes = decode(scan_crop) if self.has_edges(luma) else []
+                missed = None if barcodes else luma
+            self.result_queue.put((barcodes, (*geometry, *scan_crop.size)))
+
+    @staticmethod
+    def has_edges(luma: np.ndarray) -> bool:
+        """Cheap check of sampled int16 luma for edges worth a zbar pass."""
+        # both axes, bars may run either way through the target
+        energy = np.abs(np.diff(luma, axis=1)).mean() + np.abs(
+            np.diff(luma, axis=0)
+        ).mean()
+        return energy >= MIN_EDGE_ENERGY
+
+    def handle_barcodes(self, barcodes, geometry, img):
+        x0_disp, y0_disp, tgt_w, tgt_h, crop_w, crop_h = geometry
+        self.barcodes = barcodes
+        # most scan frames find nothing, skip the array setup for them
+        if not self.barcodes:
+            return
+
+        self.state = UIState.IDLE
+        self.buzzer.tones([(3000, 0.1), (4000, 0.1)])
+        logger.info(f"Found {len(self.barcodes)} barcodes")
+
+        # map the barcode rects from crop to display coordinates
+        rects = np.fromiter(
+            (v for b in self.barcodes for v in b.rect), dtype=np.int32
+        ).reshape(-1, 4)
+        boxes = np.empty_like(rects)
+        boxes[:, 0] = x0_disp + rects[:, 0] * tgt_w // crop_w
+        boxes[:, 1] = y0_disp + rects[:, 1] * tgt_h // crop_h
+        boxes[:, 2] = boxes[:, 0] + rects[:, 2] * tgt_w // crop_w
+        boxes[:, 3] = boxes[:, 1] + rects[:, 3] * tgt_h // crop_h
+
+        # determine which barcode is closest to the center of the target rectangle
+        cx = (boxes[:, 0] + boxes[:, 2]) // 2 - (x0_disp + tgt_w // 2)
+        cy = (boxes[:, 1] + boxes[:, 3]) // 2 - (y0_disp + tgt_h // 2)
+        closest_barcode = self.barcodes[int((cx * cx + cy * cy).argmin())]
+        barcode_str = closest_barcode.data.decode("utf-8")
+        logger.info(f"Closest barcode: {barcode_str} at {closest_barcode.rect}")
+        self.send_barcode(barcode_str)
+
+        # Draw barcode bounds on the viewfinder image
+        draw = ImageDraw.Draw(img)
+        for box in boxes.tolist():
+            draw.rectangle(box, outline="lime", width=3)
 
     def display_update_thread(self):
         """Update display at 25 FPS."""
         target_fps = 15
         frame_time = 1.0 / target_fps
+        last_frame: Image.Image | None = None
+        drawn = None
+        next_deadline = last_tick = time.monotonic()
+        frames = 0
         while self.running:
-            start_time = time.time()
-            with self.ui.image_lock:
-                img = self.ui.draw(
-                    self.viewfinder,
-                    self.settings,
-                    ConnectionData(udc_connected=self.hid.udc_connected),
-                    UiParams(
-                        toolbar_height=self.toolbar_height,
-                        target_width=self.target_width,
-                        target_height=self.target_height,
-                        visible_settings=self.visible_settings,
-                    ),
-                    self.state,
-                    self.settings_lock,
-                )
-            # Update display
-            if self.vnc_enable:
-                self.vnc_image = img.copy()
-            self.display.image(img)
-
-            # Maintain FPS
-            elapsed = time.time() - start_time
-            sleep_time = max(0, frame_time - elapsed)
-            time.sleep(sleep_time)
-            logger.trace(f"FPS: {1.0 / (time.time() - start_time):.2f}")
+            # everything the frame is drawn from, in low light the camera
+            # runs slower than the display and frames would repeat
+            view = (
+                self.vf_frame,
+                self.state,
+                self.hid.udc_connected,
+                self.target_width,
+                self.target_height,
+                self.ui.menu_dirty,
+                self.settings_by_id["connection"].value,
+            )
+            if view != drawn:
+                drawn = view
+                with self.ui.image_lock:
+                    # take the published buffer, the capture thread leaves
+                    # it alone until this thread takes another one
+                    with self.vf_lock:
+                        self.vf_drawing = self.viewfinder
+                    img = self.ui.draw(
+                        self.vf_drawing,
+                        self.settings,
+                        ConnectionData(udc_connected=self.hid.udc_connected),
+                        UiParams(
+                            toolbar_height=self.toolbar_height,
+                            target_width=self.target_width,
+                            target_height=self.target_height,
+                            visible_settings=self.visible_settings,
+                        ),
+                        self.state,
+                    )
+                # Update display, sending only the area that changed
+                if last_frame is None:
+                    show_image(self.display, img)
+                    last_frame = img.copy()
+                else:
+                    box = ImageChops.difference(img, last_frame).getbbox()
+                    if box is not None:
+                        # the panel and last_frame get the very same pixels
+                        region = img.crop(box)
+                        image_region(self.display, region, box, img.size)
+                        last_frame.paste(region, box[:2])
+            # last_frame always holds what the panel shows
+            if self.vnc_enable and self.vnc_request.is_set():
+                self.vnc_request.clear()
+                self.vnc_index ^= 1
+                self.vnc_buffers[self.vnc_index].paste(last_frame)
+                self.vnc_image = self.vnc_buffers[self.vnc_index]
+
+            # Maintain FPS against a fixed schedule so jitter does not add up
+            next_deadline += frame_time
+            now = time.monotonic()
+            if now > next_deadline + 2 * frame_time:
+                # fell far behind, restart the schedule instead of bursting
+                next_deadline = now
+            time.sleep(max(0, next_deadline - now))
+            # report the rate once a second, not a formatted line per frame
+            frames += 1
+            tick = time.monotonic()
+            if tick - last_tick >= 1.0:
+                logger.trace(f"FPS: {frames / (tick - last_tick):.2f}")
+                frames = 0
+                last_tick = tick
+
+    def vnc_frame(self) -> Image.Image:
+        """Return the latest VNC snapshot and ask for a fresh one."""
+        self.vnc_request.set()
+        return self.vnc_image
 
     def shutdown(self):
         self.shutdown_flag = True
+        self.shutdown_event.set()
 
     def run(self) -> int:
-        """Main loop for button handling."""
+        """Wait for shutdown, buttons are handled by gpiozero callbacks."""
         try:
-            while self.running:
-                self.ui_controller.handle_button()
-                time.sleep(0.01)
-                if self.shutdown_flag:
-                    return 2
+            self.shutdown_event.wait()
         except KeyboardInterrupt:
-            self.state = UIState.NULL
-            logger.info("Shutting down")
-            self.running = False
-            self.image_thread.join()
-            self.display_thread.join()
-            logger.info("Threads stopped")
             return 1
         finally:
-            return 1
+            # every exit hands the panel back before the exit screen is drawn
+            self.stop()
+        return 2 if self.shutdown_flag else 1
+
+    def stop(self):
+        """Stop the worker threads."""
+        self.state = UIState.NULL
+        logger.info("Shutting down")
+        self.running = False
+        self.hid.close()
+        self.image_thread.join()
+        self.display_thread.join()
+        # let the writer flush a pending save and finish, exiting under it
+        # would cut the write short
+        self.settings_stop.set()
+        self.settings_dirty.set()
+        self.settings_thread.join()
+        logger.info("Threads stopped")
 
 
 if __name__ == "__main__":
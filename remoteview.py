@@ -16,11 +16,14 @@ def vnc_server_thread(
     sockServer = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     sockServer.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     sockServer.bind((vnc_bind, vnc_port))
+    sockServer.listen(4)
 
     logger.debug("VNC server started")
     while True:
-        sockServer.listen(4)
         (conn, (ip, port)) = sockServer.accept()
+        # updates are written as a header followed by pixel data, do not let
+        # Nagle hold the tail of a frame back waiting for an ACK
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
         newthread = VNCClientThread(
             sock=conn,
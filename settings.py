@@ -6,7 +6,7 @@ from typing import Any
 from loguru import logger
 
 
-@dataclass
+@dataclass(slots=True)
 class AbstractSetting(ABC):
     id: str
     name: str
@@ -31,7 +31,7 @@ class AbstractSetting(ABC):
         return cls(**data)
 
 
-@dataclass
+@dataclass(slots=True)
 class FloatSetting(AbstractSetting):
     id: str
     name: str
@@ -45,7 +45,7 @@ class FloatSetting(AbstractSetting):
     suffix: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class IntSetting(AbstractSetting):
     id: str
     name: str
@@ -58,7 +58,7 @@ class IntSetting(AbstractSetting):
     suffix: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class StringOptionSetting(AbstractSetting):
     id: str
     name: str
@@ -68,7 +68,7 @@ class StringOptionSetting(AbstractSetting):
     apply_callback: Callable[[str], None]
     suffix: str = ""
 
-@dataclass
+@dataclass(slots=True)
 class ButtonMenuSetting(AbstractSetting):
     id: str
     name: str
@@ -81,7 +81,7 @@ class ButtonMenuSetting(AbstractSetting):
         logger.debug(f"Applying setting {self.id}: {self.value}")
         self.apply_callback()
 
-@dataclass
+@dataclass(slots=True)
 class GroupSetting(AbstractSetting):
     id: str
     name: str
@@ -106,26 +106,14 @@ def get_visible_menu_items(menu_list, current_index, visible_count=2):
         Returns:
             list of (index, item): Actual indices with corresponding menu items.
         """
-        if not menu_list:
-            return []
-
         total = len(menu_list)
         visible_count = min(visible_count, total)
 
-        # Clamp current index to valid range
-        current_index = max(0, min(current_index, total - 1))
-
-        # Calculate bounds for visible items
-        half = visible_count // 2
-        start = current_index - half
-        end = start + visible_count
-
-        # Clamp window to list bounds
+        # Center the window on the current index, then clamp it to the list
+        start = current_index - visible_count // 2
+        if start > total - visible_count:
+            start = total - visible_count
         if start < 0:
             start = 0
-            end = visible_count
-        if end > total:
-            end = total
-            start = total - visible_count
 
-        return [(i, menu_list[i]) for i in range(start, end)]
\ No newline at end of file
+        return list(enumerate(menu_list[start : start + visible_count], start))
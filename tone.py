@@ -16,7 +16,8 @@ class TonePlayer:
             initial_value=0,
         )
         self.is_playing = False
-        self.queue = queue.Queue()
+        # (frequency, duration) notes, played in order by the player thread
+        self.queue = queue.SimpleQueue()
         self.player_thread = threading.Thread(
             target=self._play_tones, daemon=True, name="TonePlayer"
         )
@@ -36,5 +37,5 @@ class TonePlayer:
         self.queue.put((frequency, duration))
 
     def tones(self, notes: list[tuple[int, float]]):
-        for note, duration in notes:
-            self.queue.put((note, duration))
+        for note in notes:
+            self.queue.put(note)
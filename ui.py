@@ -1,10 +1,11 @@
 from dataclasses import dataclass
+from functools import lru_cache
 import threading
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Callable
 
 from PIL import Image
 from PIL.ImageDraw import Draw
-from PIL.ImageFont import truetype
+from PIL.ImageFont import FreeTypeFont, Layout, truetype
 from loguru import logger
 
 from settings import (
@@ -22,6 +23,44 @@ if TYPE_CHECKING:
     from main import ScannerGui
 
 
+@lru_cache(maxsize=128)
+def text_mask(
+    font: FreeTypeFont, text: str
+) -> tuple[Image.Image, tuple[int, int, int, int]]:
+    """
+    Rasterize text once into an alpha mask.
+
+    The mask is laid out exactly as ``draw.text((0, 0), ...)`` would draw it,
+    so pasting a color through it at ``xy`` matches ``draw.text(xy, ...)``.
+    Returns the mask and the text's bounding box.
+    """
+    bbox = font.getbbox(text)
+    mask = Image.new("L", (bbox[2], bbox[3]))
+    Draw(mask).text((0, 0), text, font=font, fill=255)
+    return mask, bbox
+
+
+@lru_cache(maxsize=32)
+def target_mask(width: int, height: int) -> Image.Image:
+    """Rasterize the target rectangle and its crosshair into a mask."""
+    mask = Image.new("L", (width + 1, height + 1))
+    draw = Draw(mask)
+    draw.rectangle((0, 0, width, height), outline=255, width=3)
+    draw.line((width // 2, 0, width // 2, height), fill=255, width=1)
+    draw.line((0, height // 2, width, height // 2), fill=255, width=1)
+    return mask
+
+
+# menu line text for each setting type, looked up by exact type
+MENU_FORMATTERS: dict[type, Callable[[AbstractSetting], str]] = {
+    GroupSetting: lambda s: f"{s.name}",
+    FloatSetting: lambda s: f"{s.name}: {round(s.value, s.precision)}{s.suffix}",
+    IntSetting: lambda s: f"{s.name}: {s.value}{s.suffix}",
+    StringOptionSetting: lambda s: f"{s.name}: {s.value}",
+    ButtonMenuSetting: lambda s: f"<{s.name}>",
+}
+
+
 @dataclass
 class FontConfig:
     toolbar_font_name: str
@@ -57,23 +96,39 @@ class UserInterface:
         self.font_config = font_config
         self.display = display_info
 
+        # all UI text is plain left-to-right, skip raqm shaping
         self.tb_font = truetype(
-            self.font_config.toolbar_font_name, self.font_config.toolbar_font_size
+            self.font_config.toolbar_font_name,
+            self.font_config.toolbar_font_size,
+            layout_engine=Layout.BASIC,
         )
         self.reg_font = truetype(
-            self.font_config.regular_font_name, self.font_config.regular_font_size
+            self.font_config.regular_font_name,
+            self.font_config.regular_font_size,
+            layout_engine=Layout.BASIC,
         )
 
         self.settings_stack: list[GroupSetting] = []
         self.settings_index = 0
         self.active_setting: AbstractSetting | None = None
+        # rendered settings panel, redrawn only once input marks it dirty
+        self.menu_layer: Image.Image | None = None
+        self.menu_dirty = True
+        # submenu list as last built, rebuilt only when the open group changes
+        self.exit_setting = self.make_exit_setting()
+        self.visible_group: GroupSetting | None = None
+        self.visible_menu: list[AbstractSetting] = []
 
         self.image_lock = threading.Lock()
 
     def visible_settings(self, settings: list[AbstractSetting]):
         if not self.settings_stack:
             return settings
-        return [self.make_exit_setting()] + self.settings_stack[-1].children
+        group = self.settings_stack[-1]
+        if group is not self.visible_group:
+            self.visible_group = group
+            self.visible_menu = [self.exit_setting] + group.children
+        return self.visible_menu
 
     def make_exit_setting(self):
         return StringOptionSetting(
@@ -92,35 +147,26 @@ class UserInterface:
         connection: ConnectionData,
         ui_params: UiParams,
         state: UIState,
-        settings_lock: threading.Lock,
     ) -> Image.Image:
-        # Create a copy of the image
-        draw = Draw(img)
-
-        # draw toolbar
-        draw.rectangle(
-            (0, 0, self.display.width, ui_params.toolbar_height), fill="black"
-        )
+        # draw toolbar, through its bottom edge row like draw.rectangle
+        img.paste("black", (0, 0, self.display.width, ui_params.toolbar_height + 1))
         # Center toolbar text vertically
-        state_text = f"State: {state.value}"
-        text_bbox = self.tb_font.getbbox(state_text)
+        mask, text_bbox = text_mask(self.tb_font, f"State: {state.value}")
         text_height = text_bbox[3] - text_bbox[1]
         y = (ui_params.toolbar_height - text_height) // 2
-        draw.text((10, y), state_text, font=self.tb_font, fill="white")
+        img.paste("white", (10, y), mask)
 
         # draw right-aligned UDC text
-        conn = next((s for s in settings if s.id == "connection"), None)
-        if conn and conn.value == "USB":
+        if self.app.settings_by_id["connection"].value == "USB":
             conn_text = f"Conn: {'OK' if connection.udc_connected else 'NO'}"
-            text_bbox = self.tb_font.getbbox(conn_text)
-            draw.text(
+            mask, text_bbox = text_mask(self.tb_font, conn_text)
+            img.paste(
+                "green" if connection.udc_connected else "red",
                 (
                     self.display.width - text_bbox[2] - 10,
                     (ui_params.toolbar_height - text_bbox[3] + text_bbox[1]) // 2,
                 ),
-                conn_text,
-                font=self.tb_font,
-                fill="green" if connection.udc_connected else "red",
+                mask,
             )
 
         if state in [
@@ -139,8 +185,6 @@ class UserInterface:
                 )
                 // 2
             )
-            x1 = x0 + ui_params.target_width
-            y1 = y0 + ui_params.target_height
 
             match state:
                 case UIState.IDLE:
@@ -149,123 +193,108 @@ class UserInterface:
                     color = "blue"
                 case _:
                     color = "yellow"
-            draw.rectangle((x0, y0, x1, y1), outline=color, width=3)
-            # draw crosshair
-            draw.line(
-                (
-                    x0 + ui_params.target_width // 2,
-                    y0,
-                    x0 + ui_params.target_width // 2,
-                    y1,
-                ),
-                fill=color,
-                width=1,
-            )
-            draw.line(
-                (
-                    x0,
-                    y0 + ui_params.target_height // 2,
-                    x1,
-                    y0 + ui_params.target_height // 2,
-                ),
-                fill=color,
-                width=1,
+            img.paste(
+                color,
+                (x0, y0),
+                target_mask(ui_params.target_width, ui_params.target_height),
             )
         elif state == UIState.SETTINGS:
             visible_count = ui_params.visible_settings
-            with settings_lock:
-                visible_settings = get_visible_menu_items(
-                    self.visible_settings(settings),
-                    self.settings_index,
-                    visible_count=visible_count,
-                )
-                total = len(self.visible_settings(settings))
 
             # Dynamically calculate overlay area based on visible_count
             min_overlay_height = self.display.height // 2.8
             max_overlay_height = int(self.display.height * 0.6)
-            overlay_height = max(
-                min_overlay_height,
-                min(
-                    max_overlay_height,
-                    int(self.display.height * 0.12 * visible_count),
-                ),
+            overlay_height = int(
+                max(
+                    min_overlay_height,
+                    min(
+                        max_overlay_height,
+                        int(self.display.height * 0.12 * visible_count),
+                    ),
+                )
             )
             overlay_top = self.display.height - overlay_height
-            overlay_bottom = self.display.height
 
-            overlay = Image.new(
-                "RGBA", (self.display.width, self.display.height), (0, 0, 0, 0)
-            )
-            draw_overlay = Draw(overlay)
-            draw_overlay.rectangle(
-                (0, overlay_top, self.display.width, overlay_bottom),
-                fill=(0, 0, 0, 200),
-            )
-
-            # Calculate item height and spacing
-            item_height = overlay_height // visible_count
-            vertical_padding = max(8, item_height // 8)
-            text_y_offset = vertical_padding
-
-            # Draw setting text
-            for draw_index, (i, setting) in enumerate(visible_settings):
-                color = "white"
-                if i == self.settings_index:
-                    if setting == self.active_setting:
-                        color = "cyan"
-                    else:
-                        color = "yellow"
-                if setting.id == "exit":
-                    state_text = setting.name
-                elif isinstance(setting, GroupSetting):
-                    state_text = f"{setting.name}"
-                elif isinstance(setting, FloatSetting):
-                    state_text = f"{setting.name}: {round(setting.value, setting.precision)}{setting.suffix}"
-                elif isinstance(setting, IntSetting):
-                    state_text = f"{setting.name}: {setting.value}{setting.suffix}"
-                elif isinstance(setting, StringOptionSetting):
-                    state_text = f"{setting.name}: {setting.value}"
-                elif isinstance(setting, ButtonMenuSetting):
-                    state_text = f"<{setting.name}>"
-                else:
-                    logger.error(f"Unrecognized setting, {setting}")
-                    state_text = "ERROR"
-
-                y_pos = overlay_top + (text_y_offset // 2) + draw_index * item_height
-                draw_overlay.text(
-                    (16, y_pos),
-                    state_text,
-                    font=self.reg_font,
-                    fill=color,
+            # the menu only changes on input, re-render it only then
+            if (
+                self.menu_dirty
+                or self.menu_layer is None
+                or self.menu_layer.height != overlay_height
+            ):
+                # clear first so input arriving mid-render marks it again
+                self.menu_dirty = False
+                self.menu_layer = self.render_menu(
+                    settings, visible_count, overlay_height
                 )
 
-            # Draw scroll indicator if needed
-            if total > visible_count:
-                scrollbar_left = self.display.width - 18
-                scrollbar_right = self.display.width - 8
-                scrollbar_top = overlay_top + 8
-                scrollbar_bottom = overlay_bottom - 8
-                scrollbar_height = scrollbar_bottom - scrollbar_top
-
-                track_height = scrollbar_height
-                thumb_height = max(10, int(track_height * (visible_count / total)))
-
-                max_scroll = total - visible_count
-                scroll_pos = min(
-                    max(self.settings_index - (visible_count // 2), 0),
-                    max_scroll,
-                )
-                scroll_ratio = scroll_pos / max_scroll if max_scroll > 0 else 0
-                thumb_top = scrollbar_top + int(
-                    (track_height - thumb_height) * scroll_ratio
-                )
-                thumb_bottom = thumb_top + thumb_height
+            # blend onto a copy, the viewfinder buffer may be drawn again
+            # before the camera refills it
+            img = img.copy()
+            img.paste(self.menu_layer, (0, overlay_top), self.menu_layer)
+        return img
 
-                draw_overlay.rectangle(
-                    (scrollbar_left, thumb_top, scrollbar_right, thumb_bottom),
-                    fill="gray",
-                )
+    def render_menu(
+        self, settings: list[AbstractSetting], visible_count: int, height: int
+    ) -> Image.Image:
+        """Render the translucent settings panel into an RGBA layer."""
+        # build the menu list once per render
+        menu = self.visible_settings(settings)
+        visible_settings = get_visible_menu_items(
+            menu,
+            self.settings_index,
+            visible_count=visible_count,
+        )
+        total = len(menu)
+
+        overlay = Image.new("RGBA", (self.display.width, height), (0, 0, 0, 200))
+        draw_overlay = Draw(overlay)
+
+        # Calculate item height and spacing
+        item_height = height // visible_count
+        vertical_padding = max(8, item_height // 8)
+        text_y_offset = vertical_padding
+
+        # Draw setting text
+        for draw_index, (i, setting) in enumerate(visible_settings):
+            color = "white"
+            if i == self.settings_index:
+                if setting == self.active_setting:
+                    color = "cyan"
+                else:
+                    color = "yellow"
+            if setting.id == "exit":
+                state_text = setting.name
+            elif (formatter := MENU_FORMATTERS.get(type(setting))) is not None:
+                state_text = formatter(setting)
+            else:
+                logger.error(f"Unrecognized setting, {setting}")
+                state_text = "ERROR"
+
+            y_pos = (text_y_offset // 2) + draw_index * item_height
+            overlay.paste(color, (16, y_pos), text_mask(self.reg_font, state_text)[0])
+
+        # Draw scroll indicator if needed
+        if total > visible_count:
+            scrollbar_left = self.display.width - 18
+            scrollbar_right = self.display.width - 8
+            scrollbar_top = 8
+            scrollbar_bottom = height - 8
+            scrollbar_height = scrollbar_bottom - scrollbar_top
+
+            track_height = scrollbar_height
+            thumb_height = max(10, int(track_height * (visible_count / total)))
+
+            max_scroll = total - visible_count
+            scroll_pos = min(
+                max(self.settings_index - (visible_count // 2), 0),
+                max_scroll,
+            )
+            scroll_ratio = scroll_pos / max_scroll if max_scroll > 0 else 0
+            thumb_top = scrollbar_top + int((track_height - thumb_height) * scroll_ratio)
+            thumb_bottom = thumb_top + thumb_height
 
-            img = Image.alpha_composite(img.convert("RGBA"), overlay).convert("RGB")
-        return img
+            draw_overlay.rectangle(
+                (scrollbar_left, thumb_top, scrollbar_right, thumb_bottom),
+                fill="gray",
+            )
+        return overlay
@@ -1,4 +1,3 @@
-import time
 from typing import TYPE_CHECKING
 
 from gpiozero import RotaryEncoder, Button
@@ -38,39 +37,38 @@ class UserInterfaceInputController:
 
         self.encoder.when_rotated = self.on_encoder_turn
         self.button.when_activated = self.on_button_press
-        self.button_press_time = None
+        self.button.when_held = self.on_button_held
+        self.button.when_deactivated = self.on_button_release
+        self.button_was_held = False
 
         self.trigger.when_activated = self.on_trigger_press
         self.trigger.when_deactivated = self.on_trigger_release
 
     def on_encoder_turn(self, enc: RotaryEncoder):
         """Handle encoder rotation."""
-        delta = 1 if enc.value > 0 else -1
-        logger.trace(f"Encoder turned: delta={delta}, raw={enc.value}")
-        enc.value = 0
+        # gpiozero fires this once per detent right after counting it, read
+        # and reset steps so it always holds the turn of this callback
+        delta = enc.steps
+        enc.steps = 0
+        logger.trace(f"Encoder turned: delta={delta}")
+        if not delta:
+            return
         with self.ui.image_lock:
             if self.app.state == UIState.TARGET_ADJUST_W:
-                width = max(10, min(200, self.app.target_width + delta * 5))
-                for setting in self.settings:
-                    if setting.id == "tgt_width":
-                        setting.value = width
-                        setting.apply()
-                        self.app.target_width = width
-                        self.app.save_settings()
-                        break
+                setting = self.app.all_settings_by_id["tgt_width"]
+                setting.value = max(10, min(200, self.app.target_width + delta * 5))
+                setting.apply()
+                self.app.save_settings()
                 logger.debug(f"Target width adjusted to {self.app.target_width}")
             elif self.app.state == UIState.TARGET_ADJUST_H:
-                height = max(10, min(200, self.app.target_height + delta * 5))
-                for setting in self.settings:
-                    if setting.id == "tgt_height":
-                        setting.value = height
-                        setting.apply()
-                        self.app.target_height = height
-                        self.app.save_settings()
-                        break
+                setting = self.app.all_settings_by_id["tgt_height"]
+                setting.value = max(10, min(200, self.app.target_height + delta * 5))
+                setting.apply()
+                self.app.save_settings()
                 logger.debug(f"Target height adjusted to {self.app.target_height}")
             elif self.app.state == UIState.SETTINGS:
                 visible = self.ui.visible_settings(self.settings)
+                self.ui.menu_dirty = True
 
                 if self.ui.active_setting is None:
                     # Not editing – scroll cursor
@@ -102,72 +100,68 @@ class UserInterfaceInputController:
                     self.app.save_settings()
 
     def on_button_press(self):
-        """Handle button press (start timing for short/long detection)."""
-        self.button_press_time = time.time()
+        """Handle button press (start of a short or long press)."""
+        self.button_was_held = False
         logger.debug("Button pressed")
 
-    def handle_button(self):
-        """Handle encoder button short/long press."""
-        if self.button_press_time:
-            now = time.time()
-            short_press = (now - self.button_press_time) < self.button.hold_time
-            long_press = (
-                now - self.button_press_time
-            ) > self.button.hold_time and self.button.is_held
-
-            if short_press and not self.button.is_active:
-                # Short press
-                if self.app.state == UIState.SETTINGS:
-                    visible = self.ui.visible_settings(self.settings)
-                    selected = visible[self.ui.settings_index]
-
-                    if self.ui.active_setting:
-                        # Deselect setting
-                        self.ui.active_setting = None
-                    elif selected.id == "exit":
-                        if self.ui.settings_stack:
-                            self.ui.settings_stack.pop()
-                            self.ui.settings_index = 0
-                        else:
-                            self.app.state = UIState.IDLE
-                            self.ui.settings_stack.clear()
-                            self.ui.settings_index = 0
-                    elif isinstance(selected, GroupSetting):
-                        self.ui.settings_stack.append(selected)
+    def on_button_release(self):
+        """Handle button release, a short press unless it was held."""
+        if self.button_was_held:
+            return
+        with self.ui.image_lock:
+            if self.app.state == UIState.SETTINGS:
+                visible = self.ui.visible_settings(self.settings)
+                selected = visible[self.ui.settings_index]
+
+                if self.ui.active_setting:
+                    # Deselect setting
+                    self.ui.active_setting = None
+                elif selected.id == "exit":
+                    if self.ui.settings_stack:
+                        self.ui.settings_stack.pop()
                         self.ui.settings_index = 0
                     else:
-                        self.ui.active_setting = selected
-                        if isinstance(selected, ButtonMenuSetting):
-                            selected.apply()
-                elif self.app.state == UIState.IDLE:
-                    self.app.state = UIState.TARGET_ADJUST_W
-                elif self.app.state == UIState.TARGET_ADJUST_W:
-                    self.app.state = UIState.TARGET_ADJUST_H
-                elif self.app.state == UIState.TARGET_ADJUST_H:
-                    self.app.state = UIState.IDLE
+                        self.app.state = UIState.IDLE
+                        self.ui.settings_stack.clear()
+                        self.ui.settings_index = 0
+                elif isinstance(selected, GroupSetting):
+                    self.ui.settings_stack.append(selected)
+                    self.ui.settings_index = 0
+                else:
+                    self.ui.active_setting = selected
+                    if isinstance(selected, ButtonMenuSetting):
+                        selected.apply()
+                self.ui.menu_dirty = True
+            elif self.app.state == UIState.IDLE:
+                self.app.state = UIState.TARGET_ADJUST_W
+            elif self.app.state == UIState.TARGET_ADJUST_W:
+                self.app.state = UIState.TARGET_ADJUST_H
+            elif self.app.state == UIState.TARGET_ADJUST_H:
+                self.app.state = UIState.IDLE
 
-                logger.info(f"State changed to {self.app.state}")
-                self.button_press_time = None
+        logger.info(f"State changed to {self.app.state}")
 
-            elif long_press:
-                logger.debug("Long press detected")
-                with self.ui.image_lock:
-                    if self.app.state == UIState.IDLE:
-                        self.app.state = UIState.SETTINGS
-                        self.ui.settings_stack.clear()
-                        self.settings_index = 0
-                        self.active_setting = None
-                    elif self.app.state == UIState.SETTINGS:
-                        if self.ui.settings_stack:
-                            self.ui.settings_stack.pop()  # Exit submenu
-                            self.settings_index = 0
-                            self.active_setting = None
-                        else:
-                            self.app.state = UIState.IDLE
-                            self.active_setting = None
-
-                    logger.info(f"State changed to {self.app.state}")
-                self.button_press_time = None
+    def on_button_held(self):
+        """Handle button held past its hold time (long press)."""
+        self.button_was_held = True
+        logger.debug("Long press detected")
+        with self.ui.image_lock:
+            if self.app.state == UIState.IDLE:
+                self.app.state = UIState.SETTINGS
+                self.ui.settings_stack.clear()
+                self.ui.settings_index = 0
+                self.ui.active_setting = None
+            elif self.app.state == UIState.SETTINGS:
+                if self.ui.settings_stack:
+                    self.ui.settings_stack.pop()  # Exit submenu
+                    self.ui.settings_index = 0
+                    self.ui.active_setting = None
+                else:
+                    self.app.state = UIState.IDLE
+                    self.ui.active_setting = None
+            self.ui.menu_dirty = True
+
+            logger.info(f"State changed to {self.app.state}")
 
     def on_trigger_press(self):
         logger.debug("Trigger pressed")
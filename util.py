@@ -1,10 +1,12 @@
+from functools import cache
 import os
 
 from loguru import logger
 
 
+@cache
 def is_root():
     if not hasattr(os, "getuid"):
         logger.warning("os.getuid() not available on your platform, assuming root")
         return True
-    return getattr(os, "getuid")() == 0
+    return os.getuid() == 0
@@ -17,7 +17,8 @@
 
 import struct
 from typing import Callable
-from PIL import Image, ImageChops
+import numpy as np
+from PIL import Image
 
 import socket
 import time
@@ -33,12 +34,44 @@ from vnc.util.encodings.common import ENCODINGS
 from vnc.util.auth.vnc_auth import VNCAuth
 
 
+def changed_bbox(new, old):
+    """Bounding box of the pixels that differ between two frames, or None."""
+    height = new.shape[0]
+    # compare whole rows as bytes, the contiguous reductions are far cheaper
+    # than reducing over the 3 channels of every pixel
+    diff = (new != old).reshape(height, -1)
+    rows = np.flatnonzero(diff.any(axis=1))
+    if not rows.size:
+        return None
+    cols = np.flatnonzero(diff[rows[0] : rows[-1] + 1].any(axis=0)) // new.shape[2]
+    return (int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1)
+
+
+def sendmsg_all(sock, buffers):
+    """``sendall`` for several buffers, gathered by ``sendmsg`` without joining them."""
+    views = [memoryview(b).cast("B") for b in buffers]
+    while views:
+        sent = sock.sendmsg(views)
+        # drop what went out, a short send can stop inside any buffer
+        while views and sent >= views[0].nbytes:
+            sent -= views[0].nbytes
+            views.pop(0)
+        if sent:
+            views[0] = views[0][sent:]
+
+
 class VNCServer:
     class RFB_SECTYPES:
         vncauth = 2  # plain VNC auth
 
     encoding_object = None
 
+    # fixed RFB message layouts, compiled once
+    SERVER_INIT = struct.Struct("!HHBBBBHHHBBBxxxI")
+    PIXEL_FORMAT = struct.Struct("!xxxBBBBHHHBBBxxx")
+    UPDATE_REQUEST = struct.Struct("!BHHHH")
+    EMPTY_UPDATE = struct.Struct("!BxH").pack(0, 0)
+
     def __init__(
         self,
         socket,
@@ -57,7 +90,7 @@ class VNCServer:
         self.pem_file = pem_file
         self.vnc_config = vnc_config
         self.image_source = image_source
-        logger.debug("Configured auth type:", self.auth_type)
+        logger.debug("Configured auth type: {}", self.auth_type)
 
     def __del__(self):
         logger.debug("VncServer died")
@@ -80,7 +113,7 @@ class VNCServer:
         sock = self.socket
         sock.send(self.initmsg.encode())
         data = self.get_buffer(30)
-        logger.debug("init received: '%s'" % data)
+        logger.debug("init received: '{}'", data)
         server_version = float(self.RFB_VERSION)
         if not data:
             return False
@@ -90,7 +123,7 @@ class VNCServer:
         except ValueError:
             logger.debug("Error parsing client version")
             return False
-        logger.debug("client, server:", client_version, server_version)
+        logger.debug("client, server: {}, {}", client_version, server_version)
 
         # Determine auth type
         if not self.password:
@@ -108,7 +141,7 @@ class VNCServer:
         sectype = struct.unpack("B", data)[0]
 
         if sectype not in sectypes:
-            logger.debug("Incompatible security type: %s" % data)
+            logger.debug("Incompatible security type: {}", data)
             sock.send(struct.pack("B", 1))
             self.send_message("Incompatible security type")
             sock.close()
@@ -133,7 +166,7 @@ class VNCServer:
             return False
 
         data = self.get_buffer(30)
-        logger.debug("Clientinit (shared flag)", repr(data))
+        logger.debug("Clientinit (shared flag) {!r}", data)
         self.server_init()
         return True
 
@@ -147,145 +180,161 @@ class VNCServer:
         self.width = width
         height = size[1]
         self.height = height
-        bpp = 32
-        depth = 24
-        self.depth = depth
-        self.bpp = bpp
-        bigendian = 0
+        # the pixel format advertised here is used until the client sends
+        # SetPixelFormat, which many clients never do
+        self.bpp = 32
+        self.depth = 24
+        self.bigendian = 0
         self.truecolor = 1
-        red_maximum = 255
-        green_maximum = 255
-        blue_maximum = 255
-        red_shift = 16
-        green_shift = 8
-        blue_shift = 0
+        self.red_maximum = 255
+        self.green_maximum = 255
+        self.blue_maximum = 255
+        self.red_shift = 16
+        self.green_shift = 8
+        self.blue_shift = 0
+        self.primaryOrder = "rgb"
         self.rfb_bitmap = RfbBitmap()
-
-        sendbuff = struct.pack("!HH", width, height)
-        sendbuff += struct.pack("!BBBB", bpp, depth, bigendian, self.truecolor)
-        sendbuff += struct.pack(
-            "!HHHBBB",
-            red_maximum,
-            green_maximum,
-            blue_maximum,
-            red_shift,
-            green_shift,
-            blue_shift,
+        self.configure_bitmap()
+
+        desktop_name = self.vnc_config.win_title.encode()
+        sendbuff = self.SERVER_INIT.pack(
+            width,
+            height,
+            self.bpp,
+            self.depth,
+            self.bigendian,
+            self.truecolor,
+            self.red_maximum,
+            self.green_maximum,
+            self.blue_maximum,
+            self.red_shift,
+            self.green_shift,
+            self.blue_shift,
+            len(desktop_name),
         )
-        sendbuff += struct.pack("!xxx")
-
-        desktop_name = self.vnc_config.win_title
-        desktop_name_len = len(desktop_name)
-        sendbuff += struct.pack("!I", desktop_name_len)
-        sendbuff += desktop_name.encode()
+        sendbuff += desktop_name
 
         sock.send(sendbuff)
 
+    def configure_bitmap(self):
+        """Hand the current pixel format to the bitmap packer."""
+        bitmap = self.rfb_bitmap
+        bitmap.bpp = self.bpp
+        bitmap.depth = self.depth
+        bitmap.primaryOrder = self.primaryOrder
+        bitmap.truecolor = self.truecolor
+        bitmap.red_shift = self.red_shift
+        bitmap.green_shift = self.green_shift
+        bitmap.blue_shift = self.blue_shift
+        bitmap.red_maximum = self.red_maximum
+        bitmap.green_maximum = self.green_maximum
+        bitmap.blue_maximum = self.blue_maximum
+        bitmap.bigendian = self.bigendian
+
+    # client message type -> (fixed payload length, handler method name)
+    CLIENT_MESSAGES = {
+        0: (19, "set_pixel_format"),
+        2: (3, "set_encodings"),
+        3: (9, "framebuffer_update_request"),
+        4: (7, None),  # KeyEvent
+        5: (5, None),  # PointerEvent
+        6: (7, "client_cut_text"),
+    }
+
     def handle_client(self):
         self.socket.settimeout(None)
-        last_rfbu = time.time()
-        self.primaryOrder = "bgr"
+        self.last_rfbu = time.time()
         self.encoding = ENCODINGS.raw
         self.encoding_object = encs.common.encodings[self.encoding]()
         sock = self.socket
+        # buffered reads pull every message the client has queued in one
+        # recv, instead of a recv for the type and another for the payload
+        rfile = sock.makefile("rb")
 
-        while True:
-            try:
-                data = sock.recv(1)
-            except (socket.timeout, socket.error):
-                continue
-            except Exception as e:
-                logger.debug("exception '%s'" % e)
-                sock.close()
-                break
-
-            if not data:
-                sock.close()
-                break
+        try:
+            while True:
+                data = rfile.read(1)
+                if not data:
+                    break
 
-            if data[0] == 0:  # SetPixelFormat
-                data2 = sock.recv(19, socket.MSG_WAITALL)
-                logger.debug("Client Message Type: Set Pixel Format (0)")
-                (
-                    self.bpp,
-                    self.depth,
-                    self.bigendian,
-                    self.truecolor,
-                    self.red_maximum,
-                    self.green_maximum,
-                    self.blue_maximum,
-                    self.red_shift,
-                    self.green_shift,
-                    self.blue_shift,
-                ) = struct.unpack("!xxxBBBBHHHBBBxxx", data2)
-
-                self.primaryOrder = "rgb" if self.red_shift > self.blue_shift else "bgr"
-
-                self.rfb_bitmap.bpp = self.bpp
-                self.rfb_bitmap.depth = self.depth
-                self.rfb_bitmap.dither = False
-                self.rfb_bitmap.primaryOrder = self.primaryOrder
-                self.rfb_bitmap.truecolor = self.truecolor
-                self.rfb_bitmap.red_shift = self.red_shift
-                self.rfb_bitmap.green_shift = self.green_shift
-                self.rfb_bitmap.blue_shift = self.blue_shift
-                self.rfb_bitmap.red_maximum = self.red_maximum
-                self.rfb_bitmap.green_maximum = self.green_maximum
-                self.rfb_bitmap.blue_maximum = self.blue_maximum
-                self.rfb_bitmap.bigendian = self.bigendian
-
-                if self.bpp == 8:
-                    self.primaryOrder = "bgr"
-
-                logger.debug("Using order:", self.primaryOrder)
-
-                # FIX: Clear framebuffer cache and force full update
-                self.framebuffer = None
-                self.send_rectangles(sock, 0, 0, self.width, self.height, incremental=0)
-
-                continue
-            elif data[0] == 2:  # SetEncoding
-                data2 = sock.recv(3)
-                logger.debug("Client Message Type: SetEncoding (2)")
-                (nencodings,) = struct.unpack("!xH", data2)
-                data2 = sock.recv(4 * nencodings, socket.MSG_WAITALL)
-                self.client_encodings = struct.unpack("!%si" % nencodings, data2)
-                for e in encs.common.encodings_priority:
-                    if e in self.client_encodings:
-                        if self.encoding != e:
-                            self.encoding = e
-                            self.encoding_object = encs.common.encodings[
-                                self.encoding
-                            ]()
-                        break
-                continue
-            elif data[0] == 3:  # FBUpdateRequest
-                data2 = sock.recv(9, socket.MSG_WAITALL)
-                if not data2:
+                message = self.CLIENT_MESSAGES.get(data[0])
+                if message is None:
+                    # without a length the stream cannot be resynchronised
+                    logger.debug(f"Unknown client message type {data[0]}, closing")
+                    break
+                length, handler = message
+                payload = rfile.read(length)
+                if len(payload) < length:
                     logger.debug("connection closed?")
                     break
-                if time.time() - last_rfbu < 0.05:
-                    try:
-                        sock.sendall(struct.pack("!BxH", 0, 0))
-                    except (ConnectionResetError, BrokenPipeError):
-                        break
-                    continue
-                last_rfbu = time.time()
-                (incremental, x, y, w, h) = struct.unpack("!BHHHH", data2)
-                self.send_rectangles(sock, x, y, w, h, incremental)
-                continue
-            elif data[0] == 4:  # keyboard event
-                sock.recv(7, socket.MSG_WAITALL)
-                continue
-            elif data[0] == 5:  # PointerEvent
-                sock.recv(5, socket.MSG_WAITALL)
-                continue
-            elif data[0] == 6:  # ClientCutText
-                sock.recv(5, socket.MSG_WAITALL)
-            else:
-                data2 = sock.recv(4096)
-                logger.debug(f"Server received data: {repr(data[0]), data + data2}")
-                sock.recv(5, socket.MSG_WAITALL)
+                if handler and getattr(self, handler)(rfile, payload) is False:
+                    break
+        except OSError as e:
+            # the socket blocks without a timeout, any error here is the
+            # connection going away and retrying the read only spins on it
+            logger.debug(f"Client connection lost: {e}")
+        finally:
+            rfile.close()
+            sock.close()
+
+    def set_pixel_format(self, rfile, payload):
+        logger.debug("Client Message Type: Set Pixel Format (0)")
+        (
+            self.bpp,
+            self.depth,
+            self.bigendian,
+            self.truecolor,
+            self.red_maximum,
+            self.green_maximum,
+            self.blue_maximum,
+            self.red_shift,
+            self.green_shift,
+            self.blue_shift,
+        ) = self.PIXEL_FORMAT.unpack(payload)
+
+        self.primaryOrder = "rgb" if self.red_shift > self.blue_shift else "bgr"
+        if self.bpp == 8:
+            self.primaryOrder = "bgr"
+        # the format only changes here, not per update
+        self.configure_bitmap()
+
+        logger.debug("Using order: {}", self.primaryOrder)
+
+        # FIX: Clear framebuffer cache and force full update
+        self.framebuffer = None
+        return self.send_rectangles(
+            self.socket, 0, 0, self.width, self.height, incremental=0
+        )
+
+    def set_encodings(self, rfile, payload):
+        logger.debug("Client Message Type: SetEncoding (2)")
+        (nencodings,) = struct.unpack("!xH", payload)
+        data = rfile.read(4 * nencodings)
+        if len(data) < 4 * nencodings:
+            return False
+        self.client_encodings = struct.unpack("!%si" % nencodings, data)
+        for e in encs.common.encodings_priority:
+            if e in self.client_encodings:
+                if self.encoding != e:
+                    self.encoding = e
+                    self.encoding_object = encs.common.encodings[self.encoding]()
+                break
+
+    def framebuffer_update_request(self, rfile, payload):
+        if time.time() - self.last_rfbu < 0.05:
+            try:
+                self.socket.sendall(self.EMPTY_UPDATE)
+            except (ConnectionResetError, BrokenPipeError):
+                return False
+            return
+        self.last_rfbu = time.time()
+        (incremental, x, y, w, h) = self.UPDATE_REQUEST.unpack(payload)
+        return self.send_rectangles(self.socket, x, y, w, h, incremental)
+
+    def client_cut_text(self, rfile, payload):
+        # the clipboard text is not used, but has to be consumed
+        (length,) = struct.unpack("!xxxI", payload)
+        return len(rfile.read(length)) == length
 
     def get_rectangle(self, x, y, w, h):
         scr = self.image_source()
@@ -301,43 +350,36 @@ class VNCServer:
         if not rectangle:
             rectangle = Image.new("RGB", [w, h], (0, 0, 0))
 
-        lastshot = rectangle
-        sendbuff = bytearray()
+        # kept as an array, the next incremental update diffs against it
+        # without converting the previous frame again
+        lastshot = np.asarray(rectangle)
         if not self.encoding_object:
             return False
         self.encoding_object.firstUpdateSent = False
 
         if self.framebuffer is not None and incremental == 1:
-            diff = ImageChops.difference(rectangle, self.framebuffer)
-            if diff.getbbox() is None:
-                rectangles = 0
-                sendbuff.extend(struct.pack("!BxH", 0, rectangles))
+            if lastshot.shape == self.framebuffer.shape:
+                bbox = changed_bbox(lastshot, self.framebuffer)
+            else:
+                bbox = (0, 0, *rectangle.size)
+            if bbox is None:
                 try:
-                    sock.sendall(sendbuff)
+                    sock.sendall(self.EMPTY_UPDATE)
                 except (ConnectionResetError, BrokenPipeError):
                     return False
                 return
             else:
-                if hasattr(diff, "getbbox"):
-                    rectangle = rectangle.crop(diff.getbbox())
-                    (x, y, _, _) = diff.getbbox()
-                    w = rectangle.width
-                    h = rectangle.height
-
-        bitmap = self.rfb_bitmap
-        bitmap.bpp = self.bpp
-        bitmap.depth = self.depth
-        bitmap.dither = False
-        bitmap.primaryOrder = self.primaryOrder
-        bitmap.truecolor = self.truecolor
-        bitmap.red_shift = self.red_shift
-        bitmap.green_shift = self.green_shift
-        bitmap.blue_shift = self.blue_shift
-
-        image = bitmap.get_bitmap(rectangle)
-        sendbuff.extend(self.encoding_object.send_image(x, y, w, h, image))
+                rectangle = rectangle.crop(bbox)
+                # the box is relative to the requested region
+                x += bbox[0]
+                y += bbox[1]
+                w = rectangle.width
+                h = rectangle.height
+
+        image = self.rfb_bitmap.get_bitmap(rectangle)
+        buffers = self.encoding_object.send_image(x, y, w, h, image)
         self.framebuffer = lastshot
         try:
-            sock.sendall(sendbuff)
+            sendmsg_all(sock, buffers)
         except (ConnectionResetError, BrokenPipeError):
             return False
@@ -36,10 +36,10 @@ class VNCAuth:
         if data == crypted:
             # Handshake successful
             sock.send(pack("!I", 0))
-            logger.debug(__name__, "Auth OK")
+            logger.debug("Auth OK")
             return True
         else:
-            logger.debug(__name__, "Invalid auth")
+            logger.debug("Invalid auth")
             sleep(3)
             sock.send(pack("!I", 1))
             return False
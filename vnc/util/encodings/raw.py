@@ -21,8 +21,6 @@ from loguru import logger
 
 
 class Encoding:
-    _buff = None
-
     name = "raw"
     id = 0
     description = "Raw VNC encoding"
@@ -30,21 +28,21 @@ class Encoding:
     firstUpdateSent = False
 
     def __init__(self):
-        logger.debug("Initialized", __name__)
+        logger.debug("Initialized {}", __name__)
 
     def send_image(self, x, y, w, h, image):
-        self._buff = bytearray()
-        rectangles = 1
-        self._buff.extend(
-            pack("!BxH", 0, rectangles)
-        )  # message type 0 == FramebufferUpdate
-        self._buff.extend(pack("!HHHH", x, y, w, h))
-        self._buff.extend(pack(">i", self.id))
-        self._buff.extend(image.tobytes())
+        """
+        Encode one rectangle as a FramebufferUpdate.
 
-        return self._buff
+        The header and pixel data are returned as separate buffers so they
+        can be sent together without copying the pixels behind the header.
+        """
+        rectangles = 1
+        # message type 0 == FramebufferUpdate
+        header = pack("!BxHHHHHi", 0, rectangles, x, y, w, h, self.id)
+        return header, image.tobytes()
 
 
 common.encodings[common.ENCODINGS.raw] = Encoding
 
-logger.debug("Loaded encoding: %s (%s)" % (__name__, Encoding.id))
+logger.debug("Loaded encoding: {} ({})", __name__, Encoding.id)
@@ -5,6 +5,11 @@ from loguru import logger
 
 __all__ = ["RfbBitmap"]
 
+# BGR233 bits of every channel byte, so packing a pixel is three lookups
+_BGR233_R = np.arange(256, dtype=np.uint8) >> 6
+_BGR233_G = (np.arange(256, dtype=np.uint8) >> 5) << 3
+_BGR233_B = (np.arange(256, dtype=np.uint8) >> 6) << 6
+
 
 class RfbBitmap:
     def __init__(self):
@@ -16,7 +21,40 @@ class RfbBitmap:
         self.red_shift: int | None = None
         self.green_shift: int | None = None
         self.blue_shift: int | None = None
+        self.red_maximum: int | None = None
+        self.green_maximum: int | None = None
+        self.blue_maximum: int | None = None
         self.bigendian: int = 0
+        # 16bpp lookup tables and the pixel format they were built for
+        self._lut16_format: tuple | None = None
+        self._lut16: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+
+    def lut16(self):
+        """Per-channel tables from a byte to its bits of a 16bpp pixel."""
+        pixel_format = (
+            self.red_maximum,
+            self.green_maximum,
+            self.blue_maximum,
+            self.red_shift,
+            self.green_shift,
+            self.blue_shift,
+            self.bigendian,
+        )
+        if pixel_format != self._lut16_format:
+            # built in the client's byte order, the packed pixels are then
+            # already the wire format
+            dtype = ">u2" if self.bigendian else "<u2"
+            v = np.arange(256, dtype=np.uint32)
+            self._lut16 = tuple(
+                ((v * (maximum + 1) >> 8) << shift).astype(dtype)
+                for maximum, shift in (
+                    (self.red_maximum, self.red_shift),
+                    (self.green_maximum, self.green_shift),
+                    (self.blue_maximum, self.blue_shift),
+                )
+            )
+            self._lut16_format = pixel_format
+        return self._lut16
 
     def get_bitmap(self, rectangle):
         if self.bpp is None:
@@ -36,58 +74,39 @@ class RfbBitmap:
             return None
 
         if self.bpp == 32:
-            redBits = 8
-            greenBits = 8
-            blueBits = 8
-
-            # image array
-            a = np.asarray(rectangle).copy()
-
-            redMask = ((1 << redBits) - 1) << self.red_shift
-            greenMask = ((1 << greenBits) - 1) << self.green_shift
-            blueMask = ((1 << blueBits) - 1) << self.blue_shift
-            a[..., 0] = (a[..., 0]) & redMask >> self.red_shift
-            a[..., 1] = (a[..., 1]) & greenMask >> self.green_shift
-            a[..., 2] = (a[..., 2]) & blueMask >> self.blue_shift
-
-            image = Image.fromarray(a)
-            if image.mode == "RGBA":
-                (r, g, b, a) = image.split()
-                image = Image.merge("RGB", (r, g, b))
-                del r, g, b, a
-
-            if self.primaryOrder == "rgb":
-                (b, g, r) = image.split()
-                image = Image.merge("RGB", (r, g, b))
-                del b, g, r
-            image = image.convert("RGBX")
-            return image
+            # every channel is a whole byte at 32bpp, the shifts only decide
+            # the byte order: red in the high bits is B, G, R in memory.
+            # PIL keeps RGB images as padded RGBX already, so its raw packer
+            # writes the wire format directly, a plain copy for bgr order
+            rawmode = "BGRX" if self.primaryOrder == "rgb" else "RGBX"
+            return Image.frombuffer(
+                "RGBX",
+                rectangle.size,
+                rectangle.tobytes("raw", rawmode),
+                "raw",
+                "RGBX",
+                0,
+                1,
+            )
 
         elif self.bpp == 16:
-            # BGR565
-            a = np.array(rectangle)
-            r = (a[..., 0] >> 3) & 0x1F
-            g = (a[..., 1] >> 2) & 0x3F
-            b = (a[..., 2] >> 3) & 0x1F
-            bgr565 = (r << 11) | (g << 5) | b
-            bgr565 = bgr565.astype("uint16")
-            if self.bigendian == 0:
-                bgr565 = bgr565.byteswap().newbyteorder()
-            bgr565_bytes = bgr565.tobytes()
-            image = Image.frombytes(
-                "RGB", rectangle.size, bgr565_bytes, "raw", "BGR;16"
-            )
-            return image
+            # e.g. RGB565, three table lookups per pixel
+            a = np.asarray(rectangle)
+            lut_r, lut_g, lut_b = self.lut16()
+            out = lut_r[a[..., 0]]
+            out |= lut_g[a[..., 1]]
+            out |= lut_b[a[..., 2]]
+            # I;16 hands the two bytes per pixel back untouched on tobytes
+            return Image.frombuffer("I;16", rectangle.size, out, "raw", "I;16", 0, 1)
 
         elif self.bpp == 8:
             # BGR233
             image = rectangle.convert("RGB")
-            a = np.array(image)
-            r = (a[..., 0] >> 6) & 0x03
-            g = (a[..., 1] >> 5) & 0x07
-            b = (a[..., 2] >> 6) & 0x03
-            bgr233 = (b << 6) | (g << 3) | r
-            image = Image.fromarray(bgr233.astype("uint8"), "P")
+            a = np.asarray(image)
+            bgr233 = _BGR233_B[a[..., 2]]
+            bgr233 |= _BGR233_G[a[..., 1]]
+            bgr233 |= _BGR233_R[a[..., 0]]
+            image = Image.fromarray(bgr233, "P")
             image.putpalette(bgr233_palette.palette)
             return image
 